@@ -1,10 +1,24 @@
+import csv
+import io
 import json
 import logging
-from odoo import http
+from odoo import api, fields, http
 from odoo.http import request
+from odoo.modules.registry import Registry
+from odoo.tools import SQL
+
+from ..models.payment_connector import get_recent_exchanges, get_routing_metrics
+from ..models.print_job_relay import enqueue_print_jobs, get_relay_status
 
 _logger = logging.getLogger(__name__)
 
+EXPORT_BATCH_SIZE = 1000
+EXPORT_MAX_BATCH_SIZE = 10000
+EXPORT_COLUMNS = [
+    'id', 'name', 'pos_reference', 'date_order', 'company_id',
+    'spring_connector_id', 'spring_validated', 'spring_validation_result',
+]
+
 
 class POSSpringController(http.Controller):
     """Contrôleur pour les interactions POS avec Spring Boot API"""
@@ -45,8 +59,8 @@ class POSSpringController(http.Controller):
                         'error_type': 'not_found'
                     }
             else:
-                # Chercher le premier connecteur actif
-                connector = PaymentConnector.search([('is_active', '=', True)], limit=1)
+                # Connecteur routé selon le POS (ou la société de l'utilisateur)
+                connector = PaymentConnector._route_connector(pos_config_id=order_data.get('pos_config_id'))
                 if not connector:
                     _logger.error("Aucun connecteur Spring Boot actif trouvé")
                     return {
@@ -55,21 +69,9 @@ class POSSpringController(http.Controller):
                         'error_type': 'no_connector'
                     }
 
-            # Log de la requête
-            _logger.info(f"Validation Spring Boot via contrôleur - Connecteur: {connector.name} (v{connector.api_version})")
-            _logger.debug(f"Données ordre: {json.dumps(order_data, indent=2)}")
-
             # Valider la commande avec Spring Boot
-            result = connector.validate_payment(order_data)
-            
-            # Log du résultat  
-            success_status = "✅ SUCCÈS" if result.get('success') else "❌ ÉCHEC"
-            _logger.info(f"Résultat validation Spring Boot: {success_status}")
-            
-            if not result.get('success'):
-                _logger.warning(f"Erreur Spring Boot: {result.get('error_type', 'unknown')} - {result.get('error')}")
-            
-            return result
+            # (le connecteur journalise une ligne compacte et conserve l'échange en mémoire)
+            return connector.validate_payment(order_data)
 
         except Exception as e:
             _logger.error(f"Exception dans le contrôleur POS Spring Boot: {e}", exc_info=True)
@@ -99,6 +101,8 @@ class POSSpringController(http.Controller):
                     'api_version': conn.api_version,
                     'is_active': conn.is_active,
                     'timeout': conn.timeout,
+                    'company_id': conn.company_id.id,
+                    'pos_config_ids': conn.pos_config_ids.ids,
                     'endpoint_url': conn._get_endpoint_url()
                 })
             
@@ -117,7 +121,8 @@ class POSSpringController(http.Controller):
                 'connectors': {
                     'total_count': len(connectors),
                     'active_count': len(active_connectors),
-                    'details': connector_info
+                    'details': connector_info,
+                    'routing': get_routing_metrics()
                 },
                 'system_params': {
                     'auto_validate': request.env['ir.config_parameter'].sudo().get_param('pos_spring_connector.auto_validate', 'False'),
@@ -149,6 +154,92 @@ class POSSpringController(http.Controller):
                 headers={'Content-Type': 'application/json'}
             )
 
+    @http.route('/pos_spring/exchanges', type='http', auth='user', methods=['GET'])
+    def recent_exchanges(self, limit=None):
+        """
+        Derniers échanges requête/réponse avec Spring Boot (ring buffer du worker)
+        Réservé aux managers POS, pour diagnostic sans logs INFO volumineux
+        """
+        headers = {
+            'Content-Type': 'application/json; charset=utf-8',
+            'Cache-Control': 'no-cache'
+        }
+        if not request.env.user.has_group('point_of_sale.group_pos_manager'):
+            return request.make_response(
+                json.dumps({'success': False, 'error': 'Access denied - POS manager rights required'}),
+                headers=headers,
+                status=403
+            )
+
+        try:
+            limit = max(int(limit), 1) if limit else None
+        except ValueError:
+            limit = None
+
+        exchanges = get_recent_exchanges(limit)
+        response_data = {
+            'success': True,
+            'count': len(exchanges),
+            'routing': get_routing_metrics(),
+            'print_relay': get_relay_status(),
+            'exchanges': exchanges
+        }
+        return request.make_response(
+            json.dumps(response_data, indent=2, ensure_ascii=False, default=str),
+            headers=headers
+        )
+
+    @http.route('/pos_spring/print_jobs', type='json', auth='user', methods=['POST'])
+    def relay_print_jobs(self, events, jwt, pos_config_id=None, connector_id=None):
+        """
+        Relais des print jobs : le POS envoie les événements d'impression terminés
+        une seule fois; ils sont transmis à Spring Boot par lots en arrière-plan
+        """
+        try:
+            if not request.env.user.has_group('point_of_sale.group_pos_user'):
+                return {
+                    'success': False,
+                    'error': 'Access denied - POS user rights required',
+                    'error_type': 'access_denied'
+                }
+            if not jwt:
+                return {
+                    'success': False,
+                    'error': 'JWT token required',
+                    'error_type': 'missing_token'
+                }
+
+            PaymentConnector = request.env['payment.connector']
+            if connector_id:
+                connector = PaymentConnector.browse(connector_id).exists()
+            else:
+                connector = PaymentConnector._route_connector(pos_config_id=pos_config_id)
+            if not connector:
+                return {
+                    'success': False,
+                    'error': 'No active Spring Boot connector found',
+                    'error_type': 'no_connector'
+                }
+
+            queued = enqueue_print_jobs(
+                [event for event in events if isinstance(event, dict)],
+                connector._get_print_jobs_url(),
+                jwt,
+                connector.timeout
+            )
+            return {
+                'success': True,
+                'queued': queued
+            }
+
+        except Exception as e:
+            _logger.error(f"Erreur relais print jobs: {e}", exc_info=True)
+            return {
+                'success': False,
+                'error': f'Controller error: {str(e)}',
+                'error_type': 'controller_error'
+            }
+
     @http.route('/pos_spring/connectors', type='json', auth='user', methods=['POST'])
     def get_connectors(self):
         """
@@ -215,4 +306,102 @@ class POSSpringController(http.Controller):
                 json.dumps(error_data),
                 headers={'Content-Type': 'application/json'},
                 status=500
-            )
\ No newline at end of file
+            )
+
+    @http.route('/pos_spring/export', type='http', auth='user', methods=['GET'])
+    def export_validations(self, format='ndjson', date_from=None, date_to=None,
+                           connector_id=None, after_id=None, batch_size=None):
+        """
+        Export en flux des résultats de validation Spring Boot (NDJSON ou CSV)
+        Lecture par lots ordonnés par id : mémoire constante quelle que soit la période,
+        reprise possible via `after_id` (dernier id reçu)
+        """
+        if not request.env.user.has_group('point_of_sale.group_pos_manager'):
+            return request.make_response(
+                json.dumps({'success': False, 'error': 'Access denied - POS manager rights required'}),
+                headers={'Content-Type': 'application/json'},
+                status=403
+            )
+        if format not in ('ndjson', 'csv'):
+            return request.make_response(
+                json.dumps({'success': False, 'error': f'Unsupported format: {format}'}),
+                headers={'Content-Type': 'application/json'},
+                status=400
+            )
+
+        try:
+            connector_id = int(connector_id) if connector_id else None
+            after_id = max(int(after_id), 0) if after_id else 0
+            batch_size = int(batch_size) if batch_size else EXPORT_BATCH_SIZE
+            batch_size = max(1, min(batch_size, EXPORT_MAX_BATCH_SIZE))
+            date_from = fields.Datetime.to_datetime(date_from) if date_from else None
+            date_to = fields.Datetime.to_datetime(date_to) if date_to else None
+        except (ValueError, TypeError) as e:
+            return request.make_response(
+                json.dumps({'success': False, 'error': f'Invalid parameter: {e}'}),
+                headers={'Content-Type': 'application/json'},
+                status=400
+            )
+
+        request.env['pos.order'].check_access('read')
+
+        domain = [('spring_connector_id', '!=', False)]
+        if date_from:
+            domain.append(('date_order', '>=', date_from))
+        if date_to:
+            domain.append(('date_order', '<=', date_to))
+        if connector_id:
+            domain.append(('spring_connector_id', '=', connector_id))
+
+        stream = self._stream_validations(
+            request.env.cr.dbname, request.env.uid, request.env.companies.ids,
+            format, domain, after_id, batch_size
+        )
+        if format == 'csv':
+            headers = {
+                'Content-Type': 'text/csv; charset=utf-8',
+                'Content-Disposition': 'attachment; filename="spring_validations.csv"',
+            }
+        else:
+            headers = {'Content-Type': 'application/x-ndjson; charset=utf-8'}
+        headers['Cache-Control'] = 'no-cache'
+        return http.Response(stream, headers=headers, direct_passthrough=True)
+
+    def _stream_validations(self, dbname, uid, company_ids, format, domain, after_id, batch_size):
+        """
+        Générateur des lignes d'export; utilise son propre curseur car le flux
+        est consommé après la fin de la requête HTTP.
+        Chaque lot passe par _search : règles d'accès (ir.rule) et sociétés actives
+        appliquées comme pour l'export standard, sans charger les enregistrements
+        """
+        if format == 'csv':
+            yield self._csv_rows([EXPORT_COLUMNS])
+
+        with Registry(dbname).cursor() as cr:
+            env = api.Environment(cr, uid, {'allowed_company_ids': company_ids})
+            PosOrder = env['pos.order']
+            columns = [SQL.identifier(PosOrder._table, column) for column in EXPORT_COLUMNS]
+            last_id = after_id
+            while True:
+                query = PosOrder._search(
+                    domain + [('id', '>', last_id)], order='id', limit=batch_size
+                )
+                cr.execute(query.select(*columns))
+                rows = cr.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                if format == 'csv':
+                    yield self._csv_rows(rows)
+                else:
+                    yield ''.join(
+                        json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str, ensure_ascii=False) + '\n'
+                        for row in rows
+                    )
+                if len(rows) < batch_size:
+                    break
+
+    def _csv_rows(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
@@ -1,11 +1,98 @@
 import json
 import logging
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
 import requests
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
 
 _logger = logging.getLogger(__name__)
 
+# Journal en mémoire (par worker) des derniers échanges avec Spring Boot
+EXCHANGE_LOG_SIZE = 50
+EXCHANGE_BODY_MAX_CHARS = 4000
+_exchange_log = deque(maxlen=EXCHANGE_LOG_SIZE)
+_exchange_lock = threading.Lock()
+
+# Limitation des warnings répétés par type d'erreur
+WARNING_RATE_LIMIT_SECONDS = 60
+_warning_state = {}
+_warning_lock = threading.Lock()
+
+
+# Compteurs de décisions de routage (par worker)
+_routing_counts = {}
+_routing_lock = threading.Lock()
+
+
+def _count_routing(rule, connector_id):
+    key = f"{rule}:{connector_id}"
+    with _routing_lock:
+        _routing_counts[key] = _routing_counts.get(key, 0) + 1
+
+
+def get_routing_metrics():
+    """Nombre de décisions de routage par règle et connecteur"""
+    with _routing_lock:
+        return dict(_routing_counts)
+
+
+def _truncate(value, limit=EXCHANGE_BODY_MAX_CHARS):
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        value = json.dumps(value, default=str, ensure_ascii=False)
+    if len(value) > limit:
+        return value[:limit] + '...[%d chars tronqués]' % (len(value) - limit)
+    return value
+
+
+def record_exchange(connector, order_ref, request_payload, status_code=None,
+                    response_body=None, duration_ms=None, result=None):
+    """Enregistrer un échange requête/réponse dans le ring buffer du worker"""
+    result = result or {}
+    entry = {
+        'timestamp': time.time(),
+        'connector_id': connector.id,
+        'connector_name': connector.name,
+        'order_ref': order_ref,
+        'duration_ms': duration_ms,
+        'status_code': status_code,
+        'success': bool(result.get('success')),
+        'error_type': result.get('error_type'),
+        'request': _truncate(request_payload),
+        'response': _truncate(response_body),
+    }
+    with _exchange_lock:
+        _exchange_log.append(entry)
+
+
+def get_recent_exchanges(limit=None):
+    """Retourner les derniers échanges, du plus récent au plus ancien"""
+    with _exchange_lock:
+        entries = list(_exchange_log)
+    entries.reverse()
+    if limit:
+        entries = entries[:limit]
+    return entries
+
+
+def warn_rate_limited(error_type, message):
+    """Logger un warning au plus une fois par période et par type d'erreur"""
+    now = time.monotonic()
+    with _warning_lock:
+        last, suppressed = _warning_state.get(error_type, (None, 0))
+        if last is not None and now - last < WARNING_RATE_LIMIT_SECONDS:
+            _warning_state[error_type] = (last, suppressed + 1)
+            return
+        _warning_state[error_type] = (now, 0)
+    if suppressed:
+        message = f"{message} ({suppressed} occurrence(s) similaire(s) masquée(s))"
+    _logger.warning(message)
+
 
 class PaymentConnector(models.Model):
     _name = 'payment.connector'
@@ -17,12 +104,84 @@ class PaymentConnector(models.Model):
         ('v2', 'Version v2 (/v2/validate)')
     ], string='API Version', default='v2', required=True)
     timeout = fields.Integer(string='Timeout (seconds)', default=30)
+    chunk_size = fields.Integer(string='Chunk Size', default=0,
+                                help='Split orders with more items than this into sub-requests of one parent transaction (0 = disabled)')
     is_active = fields.Boolean(string='Active', default=True)
+    sequence = fields.Integer(string='Sequence', default=10,
+                              help='Priority when several connectors match the same POS or company')
+    company_id = fields.Many2one('res.company', string='Company',
+                                 help='Route orders of this company to this connector')
+    pos_config_ids = fields.Many2many('pos.config', string='Points of Sale',
+                                      help='Route orders of these points of sale to this connector')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'is_active', 'sequence', 'company_id', 'pos_config_ids'} & set(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache()
+    def _get_routing_table(self):
+        """
+        Table de routage calculée une fois par génération de cache :
+        POS -> connecteur, société -> connecteur, et connecteur par défaut
+        """
+        connectors = self.sudo().search([('is_active', '=', True)], order='sequence, id')
+        by_config = {}
+        by_company = {}
+        default = False
+        for connector in connectors:
+            # POS -> (connecteur, société du POS) pour vérifier l'appelant sans requête
+            for config in connector.pos_config_ids:
+                by_config.setdefault(config.id, (connector.id, config.company_id.id))
+            # Un connecteur dédié à certains POS ne sert ni toute la société, ni de défaut
+            if connector.pos_config_ids:
+                continue
+            if connector.company_id:
+                by_company.setdefault(connector.company_id.id, connector.id)
+            elif not default:
+                default = connector.id
+        return {'pos_config': by_config, 'company': by_company, 'default': default}
+
+    @api.model
+    def _route_connector(self, pos_config_id=None, company_id=None):
+        """Choisir le connecteur pour un POS / une société sans recherche en base"""
+        table = self._get_routing_table()
+        company_id = company_id or self.env.company.id
+        config_route = table['pos_config'].get(pos_config_id) if pos_config_id else None
+        # pos_config_id vient du client : ignorer un POS hors des sociétés de l'utilisateur
+        if config_route and config_route[1] not in self.env.companies.ids:
+            config_route = None
+        if config_route:
+            rule, connector_id = 'pos_config', config_route[0]
+        elif company_id in table['company']:
+            rule, connector_id = 'company', table['company'][company_id]
+        else:
+            rule, connector_id = 'default', table['default']
+        _count_routing(rule, connector_id)
+        return self.browse(connector_id) if connector_id else self.browse()
 
     def _get_endpoint_url(self):
         self.ensure_one()
         return f"{self.api_url.rstrip('/')}/v2/validate"
 
+    def _get_print_jobs_url(self):
+        self.ensure_one()
+        parts = urlsplit(self.api_url)
+        return f"{parts.scheme}://{parts.netloc}/api/print-jobs"
+
     def _prepare_payment_data(self, order_data):
         try:
             if not order_data.get('order_id'):
@@ -65,9 +224,6 @@ class PaymentConnector(models.Model):
     def _extract_subsidy_data(self, response_data):
         """✅ VERSION FINALE : Extraction COMPLÈTE avec utilisateur"""
         try:
-            # ✅ LOG complet des données reçues
-            _logger.info(f"🔍 PYTHON DEBUG - Response data COMPLÈTE: {json.dumps(response_data, indent=2)}")
-            
             # Valeurs par défaut
             extracted_data = {
                 'valide': response_data.get('status') == 'success',
@@ -130,7 +286,6 @@ class PaymentConnector(models.Model):
                 extracted_data['transactionId'] = transaction_id
                 extracted_data['idTransaction'] = transaction_id  # Backup
                 extracted_data['id'] = transaction_id  # Backup
-                _logger.info(f"🎯 TRANSACTION ID EXTRAIT: {transaction_id}")
 
 
             # ✅ COPIER LES ARTICLES
@@ -151,10 +306,8 @@ class PaymentConnector(models.Model):
                         'quantiteSansSubvention': article.get('quantiteSansSubvention', 0)
                     }
                     extracted_data['articles'].append(article_data)
-                    
-                _logger.info(f"✅ ARTICLES COPIÉS : {len(extracted_data['articles'])} article(s)")
             else:
-                _logger.warning("⚠️ Aucun article trouvé dans response_data")
+                _logger.debug("Aucun article trouvé dans response_data")
 
             # ✅ FALLBACK : Si les montants principaux sont manquants, les calculer depuis les articles
             if extracted_data['montantTotal'] == 0.0 and extracted_data['articles']:
@@ -172,11 +325,6 @@ class PaymentConnector(models.Model):
                 if extracted_data['soldeActuel'] == 0.0:
                     extracted_data['soldeActuel'] = extracted_data['nouveauSolde'] + extracted_data['partSalariale']
 
-            # ✅ LOG des données extraites AVEC utilisateur
-            _logger.info(f"🎯 PYTHON DEBUG - Données extraites: {extracted_data}")
-            _logger.info(f"🎯 UTILISATEUR EXTRAIT: {extracted_data['utilisateurNomComplet']}")
-            _logger.info(f"🎯 NOMBRE D'ARTICLES EXTRAITS: {len(extracted_data['articles'])}")
-            
             return extracted_data
 
         except Exception as e:
@@ -214,7 +362,21 @@ class PaymentConnector(models.Model):
         return 0.0
 
     def validate_payment(self, order_data):
-        """Valider le paiement via l'API Spring Boot"""
+        """
+        Valider le paiement via l'API Spring Boot
+        Appelé sans connecteur, la table de routage choisit selon `pos_config_id`
+        """
+        if not self:
+            pos_config_id = order_data.get('pos_config_id') if isinstance(order_data, dict) else None
+            connector = self._route_connector(pos_config_id=pos_config_id)
+            if not connector:
+                return {
+                    'success': False,
+                    'error': _('No active payment connector found'),
+                    'error_type': 'no_connector'
+                }
+            return connector.validate_payment(order_data)
+
         self.ensure_one()
         
         if not self.is_active:
@@ -224,78 +386,213 @@ class PaymentConnector(models.Model):
                 'error_type': 'connector_inactive'
             }
 
+        order_ref = order_data.get('order_id') if isinstance(order_data, dict) else None
+        payment_data = None
+        exchange = {}
+        started = time.monotonic()
+
         try:
             # Préparer les données
             payment_data = self._prepare_payment_data(order_data)
             
             # Si _prepare_payment_data retourne une erreur, la propager
             if isinstance(payment_data, dict) and not payment_data.get('success', True):
-                return payment_data
-            
-            # URL de l'endpoint
-            endpoint_url = self._get_endpoint_url()
-            
-            _logger.info(f"Appel API Spring Boot: {endpoint_url}")
-            _logger.debug(f"Données envoyées: {json.dumps(payment_data, indent=2)}")
-
-            # Headers
-            headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json',
-                'User-Agent': 'Odoo-POS-Connector/1.0'
-            }
-
-            # Appel API avec timeout
-            response = requests.post(
-                endpoint_url,
-                json=payment_data,
-                headers=headers,
-                timeout=self.timeout
-            )
-
-            # Log de la réponse
-            _logger.info(f"Réponse Spring Boot: Status {response.status_code}")
-            _logger.debug(f"Contenu réponse: {response.text}")
-
-            # Traitement de la réponse
-            return self._process_api_response(response)
+                result = payment_data
+            elif self.chunk_size > 0 and len(payment_data['items']) > self.chunk_size:
+                result = self._call_validate_api_chunked(payment_data, exchange)
+            else:
+                result = self._call_validate_api(payment_data, exchange)
 
         except requests.exceptions.Timeout:
-            error_msg = _("API timeout after %d seconds") % self.timeout
-            _logger.error(error_msg)
-            return {
+            result = {
                 'success': False,
-                'error': error_msg,
+                'error': _("API timeout after %d seconds") % self.timeout,
                 'error_type': 'timeout'
             }
 
         except requests.exceptions.ConnectionError:
-            error_msg = _("Cannot connect to Spring Boot API")
-            _logger.error(error_msg)
-            return {
+            result = {
                 'success': False,
-                'error': error_msg,
+                'error': _("Cannot connect to Spring Boot API"),
                 'error_type': 'connection'
             }
 
         except requests.exceptions.RequestException as e:
-            error_msg = _("API request failed: %s") % str(e)
-            _logger.error(error_msg)
-            return {
+            result = {
                 'success': False,
-                'error': error_msg,
+                'error': _("API request failed: %s") % str(e),
                 'error_type': 'request'
             }
 
         except Exception as e:
-            error_msg = _("Unexpected error: %s") % str(e)
             _logger.error(f"Erreur inattendue dans validate_payment: {e}", exc_info=True)
-            return {
+            result = {
                 'success': False,
-                'error': error_msg,
+                'error': _("Unexpected error: %s") % str(e),
                 'error_type': 'unexpected'
             }
 
+        duration_ms = round((time.monotonic() - started) * 1000, 1)
+        record_exchange(
+            self, order_ref, payment_data,
+            status_code=exchange.get('status_code'),
+            response_body=exchange.get('response_body'),
+            duration_ms=duration_ms,
+            result=result,
+        )
+        self._log_validation(order_ref, result, exchange.get('status_code'), duration_ms)
+        return result
+
+    def _call_validate_api(self, payment_data, exchange):
+        """Appel HTTP vers /v2/validate; renseigne `exchange` pour le journal"""
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'User-Agent': 'Odoo-POS-Connector/1.0'
+        }
+
+        response = requests.post(
+            self._get_endpoint_url(),
+            json=payment_data,
+            headers=headers,
+            timeout=self.timeout
+        )
+        exchange['status_code'] = response.status_code
+        exchange['response_body'] = response.text
+
+        return self._process_api_response(response)
+
+    def _call_validate_api_chunked(self, payment_data, exchange):
+        """
+        Grosses commandes : découper les items en lots bornés, tous rattachés à la
+        même commande parente (`orderId` / `chunk.parentOrderId`), et fusionner
+        les réponses au fil de l'eau dans le format de _extract_subsidy_data.
+
+        Les lots partent l'un après l'autre : chacun débite le même solde, et un
+        envoi parallèle rendrait les soldes et les plafonds de subvention
+        dépendants de l'ordre d'arrivée côté Spring Boot. L'ensemble reste borné
+        par `timeout` : au-delà, on s'arrête en validation partielle.
+
+        Hypothèse de protocole : Spring Boot doit comprendre le bloc `chunk`
+        (`runningBalance`, `subsidyApplied`) pour appliquer solde et plafonds
+        une seule fois par commande; sans cela chaque lot est traité isolément.
+        """
+        items = payment_data['items']
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        parent_id = payment_data['orderId']
+        endpoint_url = self._get_endpoint_url()
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'User-Agent': 'Odoo-POS-Connector/1.0',
+        }
+        deadline = time.monotonic() + self.timeout
+
+        merged = None
+        chunk_transaction_ids = []
+        status_codes = []
+        for index, chunk_items in enumerate(chunks):
+            chunk_meta = {
+                'parentOrderId': parent_id,
+                'index': index,
+                'count': len(chunks),
+            }
+            if merged is not None:
+                chunk_meta['runningBalance'] = merged['nouveauSolde']
+                chunk_meta['subsidyApplied'] = merged['partPatronale']
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise requests.exceptions.Timeout(
+                        _("Overall timeout of %d seconds reached") % self.timeout
+                    )
+                # Une clé par lot : corps différents, donc clés différentes
+                response = requests.post(
+                    endpoint_url,
+                    json=dict(payment_data, items=chunk_items, chunk=chunk_meta),
+                    headers=dict(headers, **{'Idempotency-Key': f"{parent_id}:{index}"}),
+                    timeout=remaining
+                )
+            except requests.exceptions.RequestException as e:
+                if merged is None:
+                    raise
+                result = {
+                    'success': False,
+                    'error': _("API request failed: %s") % str(e),
+                    'error_type': 'timeout' if isinstance(e, requests.exceptions.Timeout) else 'connection',
+                }
+            else:
+                status_codes.append(response.status_code)
+                exchange['status_code'] = response.status_code
+                exchange['response_body'] = response.text
+                result = self._process_api_response(response)
+                if result.get('success') and not result.get('data'):
+                    result = {
+                        'success': False,
+                        'error': _('Invalid response for order chunk %s') % index,
+                        'error_type': 'processing_error',
+                    }
+
+            if not result.get('success'):
+                result['chunk_index'] = index
+                if merged is not None:
+                    # Lots précédents déjà débités : les rendre visibles pour remboursement
+                    _logger.error(
+                        "Validation partielle commande %s: lot %s/%s en échec, transactions déjà passées: %s",
+                        parent_id, index + 1, len(chunks), chunk_transaction_ids
+                    )
+                    result['error_type'] = 'partial_validation'
+                    result['partial_data'] = merged
+                    result['chunkTransactionIds'] = chunk_transaction_ids
+                return result
+
+            data = result['data']
+            if data.get('transactionId'):
+                chunk_transaction_ids.append(data['transactionId'])
+            if merged is None:
+                merged = data
+            else:
+                self._merge_subsidy_data(merged, data)
+
+        exchange['status_code'] = max(status_codes)
+        exchange['response_body'] = f"{len(chunks)} chunk(s), HTTP {sorted(set(status_codes))}"
+        merged['chunkTransactionIds'] = chunk_transaction_ids
+        return {
+            'success': True,
+            'data': merged,
+            'message': merged.get('message') or _('Payment validated successfully'),
+            'spring_response': merged,
+        }
+
+    def _merge_subsidy_data(self, merged, data):
+        """Fusionner le lot suivant dans le résultat au format de _extract_subsidy_data"""
+        merged.setdefault('articles', []).extend(data.get('articles', []))
+        for key in ('montantTotal', 'partSalariale', 'partPatronale'):
+            merged[key] = merged.get(key, 0.0) + data.get(key, 0.0)
+        # Lots séquentiels : solde avant = celui du premier lot, solde après = celui du dernier
+        merged['nouveauSolde'] = data.get('nouveauSolde', merged.get('nouveauSolde', 0.0))
+        merged['valide'] = merged.get('valide', False) and data.get('valide', False)
+        # La transaction du premier lot reste la transaction de référence
+        for key in ('utilisateurNom', 'utilisateurPrenom', 'utilisateurEmail',
+                    'utilisateurCategorie', 'utilisateurNomComplet',
+                    'transactionId', 'idTransaction', 'id'):
+            if not merged.get(key) and data.get(key):
+                merged[key] = data[key]
+
+    def _log_validation(self, order_ref, result, status_code, duration_ms):
+        """Une ligne INFO compacte par validation, warnings limités par type d'erreur"""
+        success = bool(result.get('success'))
+        _logger.info(
+            "Validation Spring Boot connecteur=%s commande=%s succes=%s http=%s duree=%sms",
+            self.id, order_ref, success, status_code, duration_ms
+        )
+        if not success:
+            error_type = result.get('error_type', 'unknown')
+            warn_rate_limited(
+                error_type,
+                f"Erreur Spring Boot ({error_type}) connecteur {self.name}: {result.get('error')}"
+            )
+
     def _process_api_response(self, response):
         """Traiter la réponse de l'API Spring Boot avec détails subvention"""
         try:
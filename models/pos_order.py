@@ -37,7 +37,10 @@ class PosOrder(models.Model):
             if connector_id:
                 connector = PaymentConnector.browse(connector_id)
             else:
-                connector = PaymentConnector.search([('is_active', '=', True)], limit=1)
+                connector = PaymentConnector._route_connector(
+                    pos_config_id=self.config_id.id,
+                    company_id=self.company_id.id,
+                )
                 
             if not connector:
                 return {
@@ -48,6 +51,7 @@ class PosOrder(models.Model):
             # Préparer les données de la commande au format Spring Boot
             order_data = {
                 'order_id': self.pos_reference or self.name,
+                'pos_config_id': self.config_id.id,
                 'customer_email': self.partner_id.email if self.partner_id else 'unknown@pos.com',
                 'lines': []
             }
@@ -68,8 +72,6 @@ class PosOrder(models.Model):
                 'spring_connector_id': connector.id
             })
             
-            _logger.info(f"Commande {self.name} validée Spring Boot: {result.get('success', False)}")
-            
             return result
             
         except Exception as e:
@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import requests
+
+from .payment_connector import warn_rate_limited
+
+_logger = logging.getLogger(__name__)
+
+# Relais des print jobs vers Spring Boot : tampon en mémoire (par worker)
+# vidé par lots en arrière-plan sur une session HTTP réutilisée.
+#
+# Limite connue : le tampon n'est pas persisté. Les événements en attente sont
+# perdus sans trace si le worker Odoo est recyclé ou redémarré, ou s'ils sont
+# évincés d'un tampon plein. Le journal d'impression côté Spring Boot est donc
+# un diagnostic « au mieux », pas un registre fiable.
+RELAY_BUFFER_SIZE = 1000
+RELAY_BATCH_SIZE = 50
+RELAY_FLUSH_INTERVAL = 2.0
+RELAY_MAX_ATTEMPTS = 5
+RELAY_MAX_TIMEOUT = 5
+RELAY_BACKOFF_BASE = 5.0
+RELAY_BACKOFF_MAX = 300.0
+
+_buffer = deque(maxlen=RELAY_BUFFER_SIZE)
+_condition = threading.Condition()
+_worker = None
+_session = None
+# Spring Boot injoignable : plus aucun envoi avant cette date (time.monotonic)
+_paused_until = 0.0
+
+
+def enqueue_print_jobs(events, print_jobs_url, jwt, timeout):
+    """Mettre en tampon des print jobs terminés; retourne le nombre accepté"""
+    global _worker
+    accepted = 0
+    with _condition:
+        for event in events:
+            if len(_buffer) == _buffer.maxlen:
+                warn_rate_limited('print_relay_overflow', "Tampon print jobs plein, événement le plus ancien abandonné")
+            _buffer.append({
+                'event': event,
+                'url': print_jobs_url,
+                'jwt': jwt,
+                'timeout': min(timeout or RELAY_MAX_TIMEOUT, RELAY_MAX_TIMEOUT),
+                'attempts': 0,
+                'next_attempt': 0.0,
+            })
+            accepted += 1
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='pos_spring_print_relay', daemon=True)
+            _worker.start()
+        if len(_buffer) >= RELAY_BATCH_SIZE:
+            _condition.notify()
+    return accepted
+
+
+def get_relay_status():
+    with _condition:
+        return {
+            'pending': len(_buffer),
+            'worker_alive': bool(_worker and _worker.is_alive()),
+            'paused_for': max(0.0, round(_paused_until - time.monotonic(), 1)),
+        }
+
+
+def _backoff(attempts):
+    return min(RELAY_BACKOFF_BASE * 2 ** (attempts - 1), RELAY_BACKOFF_MAX)
+
+
+def _take_batch(now):
+    """Retirer du tampon jusqu'à RELAY_BATCH_SIZE événements dont le délai est écoulé"""
+    batch = []
+    for _ in range(len(_buffer)):
+        if len(batch) >= RELAY_BATCH_SIZE:
+            break
+        item = _buffer.popleft()
+        if item['next_attempt'] <= now:
+            batch.append(item)
+        else:
+            _buffer.append(item)
+    return batch
+
+
+def _ready_state(now):
+    """Nombre d'événements prêts à partir et prochaine échéance des autres"""
+    ready = 0
+    next_due = None
+    for item in _buffer:
+        if item['next_attempt'] <= now:
+            ready += 1
+        elif next_due is None or item['next_attempt'] < next_due:
+            next_due = item['next_attempt']
+    return ready, next_due
+
+
+def _run():
+    while True:
+        with _condition:
+            now = time.monotonic()
+            if now < _paused_until:
+                _condition.wait(_paused_until - now)
+                continue
+            ready, next_due = _ready_state(now)
+            if not ready:
+                # Rien de prêt (tampon vide ou tout en backoff) : attendre la prochaine échéance
+                delay = RELAY_FLUSH_INTERVAL if next_due is None else max(next_due - now, 0.05)
+                _condition.wait(delay)
+                continue
+            if ready < RELAY_BATCH_SIZE:
+                _condition.wait(RELAY_FLUSH_INTERVAL)
+            batch = _take_batch(time.monotonic())
+        if batch:
+            _flush(batch)
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+    return _session
+
+
+def _flush(batch):
+    global _paused_until
+    session = _get_session()
+    retry = []
+    sent = 0
+    for position, item in enumerate(batch):
+        try:
+            _forward(session, item)
+            sent += 1
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            # Spring Boot injoignable : inutile d'enchaîner les timeouts sur le reste du lot
+            item['attempts'] += 1
+            pause = _backoff(item['attempts'])
+            with _condition:
+                _paused_until = time.monotonic() + pause
+            warn_rate_limited(
+                'print_relay_unreachable',
+                f"Spring Boot injoignable pour le relais print jobs, pause de {pause:.0f}s: {e}"
+            )
+            if item['attempts'] >= RELAY_MAX_ATTEMPTS:
+                warn_rate_limited(
+                    'print_relay_failed',
+                    f"Print job abandonné après {item['attempts']} tentative(s): {e}"
+                )
+                retry.extend(batch[position + 1:])
+            else:
+                retry.extend(batch[position:])
+            break
+        except Exception as e:
+            item['attempts'] += 1
+            if item['attempts'] < RELAY_MAX_ATTEMPTS:
+                item['next_attempt'] = time.monotonic() + _backoff(item['attempts'])
+                retry.append(item)
+            else:
+                warn_rate_limited(
+                    'print_relay_failed',
+                    f"Print job abandonné après {item['attempts']} tentative(s): {e}"
+                )
+    if retry:
+        with _condition:
+            _buffer.extendleft(reversed(retry))
+    _logger.debug("Relais print jobs: %d envoyé(s), %d à réessayer", sent, len(retry))
+
+
+def _forward(session, item):
+    """Créer puis finaliser le print job côté Spring Boot"""
+    event = item['event']
+    headers = {
+        'Content-Type': 'application/json',
+        'Authorization': f"Bearer {item['jwt']}",
+        'User-Agent': 'Odoo-POS-Connector/1.0'
+    }
+
+    job_id = event.get('jobId')
+    if not job_id:
+        response = session.post(
+            item['url'],
+            json={
+                'transactionId': event.get('transactionId'),
+                'terminalId': event.get('terminalId'),
+                'requestId': event.get('requestId'),
+            },
+            headers=headers,
+            timeout=item['timeout']
+        )
+        response.raise_for_status()
+        job_id = response.json().get('jobId')
+        if not job_id:
+            raise ValueError("Réponse Spring Boot sans jobId")
+        # Ne pas recréer le job si seule la finalisation échoue
+        event['jobId'] = job_id
+
+    body = {'status': event.get('status', 'SUCCESS')}
+    if event.get('errorMessage'):
+        body['errorMessage'] = event['errorMessage']
+    if event.get('durationMs') is not None:
+        body['durationMs'] = event['durationMs']
+
+    response = session.patch(
+        f"{item['url'].rstrip('/')}/{job_id}",
+        json=body,
+        headers=headers,
+        timeout=item['timeout']
+    )
+    response.raise_for_status()
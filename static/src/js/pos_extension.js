@@ -9,6 +9,7 @@ import { CashierName } from "@point_of_sale/app/navbar/cashier_name/cashier_name
 import { patch } from "@web/core/utils/patch";
 import { registry } from "@web/core/registry";
 import { _t } from "@web/core/l10n/translation";
+import { rpc } from "@web/core/network/rpc";
 import { AlertDialog } from "@web/core/confirmation_dialog/confirmation_dialog";
 import { ConfirmationDialog } from "@web/core/confirmation_dialog/confirmation_dialog";
 
@@ -982,125 +983,17 @@ initializeInterface() {
 }
 
 
-    // ✅ NOUVELLES MÉTHODES PRINT JOB
-    async createPrintJobWithDiagnostic(transactionId, terminalId, requestId) {
-    console.log('🎯 ===== CREATE PRINT JOB DIAGNOSTIC =====');
-    console.log('📥 Paramètres:');
-    console.log('  - transactionId:', transactionId, '(type:', typeof transactionId, ')');
-    console.log('  - terminalId:', terminalId, '(type:', typeof terminalId, ')');
-    console.log('  - requestId:', requestId, '(type:', typeof requestId, ')');
-    
-    const jwt = this.authService.getJWTToken();
-    console.log('🔑 JWT Token:');
-    console.log('  - Présent?', jwt !== null);
-    console.log('  - Longueur:', jwt ? jwt.length : 0);
-    console.log('  - Début:', jwt ? jwt.substring(0, 20) + '...' : 'NULL');
-    
-    const requestBody = { transactionId, terminalId, requestId };
-    console.log('📤 Request Body:', JSON.stringify(requestBody, null, 2));
-    
-    const url = `${BACKEND_BASE_URL}/api/print-jobs`;
-    console.log('🌐 URL:', url);
-    
-    const headers = { 
-        'Content-Type': 'application/json', 
-        'Authorization': `Bearer ${jwt}` 
-    };
-    console.log('📋 Headers:', headers);
-    
-    try {
-        console.log('📡 Envoi requête...');
-        const resp = await fetch(url, {
-            method: 'POST',
-            headers: headers,
-            body: JSON.stringify(requestBody)
-        });
-        
-        console.log('📨 Réponse reçue:');
-        console.log('  - Status:', resp.status);
-        console.log('  - StatusText:', resp.statusText);
-        console.log('  - OK?', resp.ok);
-        console.log('  - Headers:', Object.fromEntries(resp.headers.entries()));
-        
-        let json;
-        try {
-            json = await resp.json();
-            console.log('📄 Response Body:', JSON.stringify(json, null, 2));
-        } catch (parseError) {
-            console.error('❌ Erreur parsing JSON:', parseError);
-            const text = await resp.text();
-            console.log('📄 Response Text:', text);
-            throw new Error('Réponse non-JSON: ' + text);
-        }
-        
-        if (!resp.ok) {
-            console.error('❌ Requête échouée');
-            console.error('  - Error dans response:', json.error);
-            console.error('  - Message:', json.message);
-            throw new Error(json.error || json.message || `HTTP ${resp.status}: ${resp.statusText}`);
-        }
-        
-        console.log('✅ PrintJob créé avec succès:');
-        console.log('  - JobID:', json.jobId);
-        console.log('  - Response complète:', json);
-        return json;
-        
-    } catch (networkError) {
-        console.error('💥 Erreur réseau/fetch:');
-        console.error('  - Type:', networkError.constructor.name);
-        console.error('  - Message:', networkError.message);
-        console.error('  - Stack:', networkError.stack);
-        throw networkError;
-    }
-}
-
-
-    async finalizePrintJobWithDiagnostic(jobId, status, errorMessage = null, durationMs = null) {
-    console.log('🔄 ===== FINALISATION PRINT JOB DIAGNOSTIC =====');
-    console.log('📥 Paramètres:');
-    console.log('  - jobId:', jobId, '(type:', typeof jobId, ')');
-    console.log('  - status:', status);
-    console.log('  - errorMessage:', errorMessage);
-    console.log('  - durationMs:', durationMs);
-    
-    const jwt = this.authService.getJWTToken();
-    console.log('🔑 JWT Token présent?', jwt !== null);
-    
-    const body = { status };
-    if (errorMessage) body.errorMessage = errorMessage;
-    if (durationMs != null) body.durationMs = durationMs;
-    
-    console.log('📤 Request Body:', JSON.stringify(body, null, 2));
-    
-    const url = `${BACKEND_BASE_URL}/api/print-jobs/${jobId}`;
-    console.log('🌐 URL:', url);
-    
-    try {
-        console.log('📡 Envoi requête PATCH...');
-        const resp = await fetch(url, {
-            method: 'PATCH',
-            headers: { 'Content-Type':'application/json', 'Authorization': `Bearer ${jwt}` },
-            body: JSON.stringify(body)
-        });
-        
-        console.log('📨 Réponse PATCH:');
-        console.log('  - Status:', resp.status);
-        console.log('  - OK?', resp.ok);
-        
-        if (resp.ok) {
-            const json = await resp.json().catch(() => ({}));
-            console.log('✅ Finalisation réussie:', json);
-        } else {
-            const text = await resp.text();
-            console.error('❌ Erreur PATCH:', resp.status, text);
-        }
-        
-    } catch (error) {
-        console.error('💥 Erreur réseau PATCH:', error);
+    // ✅ PRINT JOB : relais serveur Odoo
+    // Envoi non bloquant au relais Odoo (création + finalisation côté serveur)
+    relayPrintJob(event, jwt) {
+        const order = this.env.services.pos?.get_order?.();
+        const configId = (order?.config_id && order.config_id.id) || this.env.services.pos?.config?.id || null;
+        rpc('/pos_spring/print_jobs', { events: [event], jwt, pos_config_id: configId })
+            .then((res) => {
+                if (!res?.success) console.warn('⚠️ Relais print job refusé:', res?.error);
+            })
+            .catch((error) => console.error('💥 Erreur relais print job:', error));
     }
-}
-
-
 
     openTicketWindowAndPrintWithDiagnostic(ticketHtml, mmWidth = 58) {
     console.log('🖨️ ===== IMPRESSION SANS POPUP =====');
@@ -1271,7 +1164,8 @@ initializeInterface() {
                 const customer = order.get_partner();
                 customerEmail = customer ? (customer.email || 'unknown@pos.com') : 'unknown@pos.com';
             }
-            const orderData = { order_id: order.name || order.uid, customer_email: customerEmail, lines: [] };
+            const configId = (order.config_id && order.config_id.id) || (order.config && order.config.id) || null;
+            const orderData = { order_id: order.name || order.uid, customer_email: customerEmail, pos_config_id: configId, lines: [] };
             const lines = order.orderlines || order.lines || order.get_orderlines() || [];
             if (!lines || lines.length === 0) throw new Error('No order lines found');
 
@@ -1295,14 +1189,9 @@ initializeInterface() {
             if (!this.isAuthenticated()) throw new Error('Session expirée');
             const orderData = this.prepareOrderData(order);
 
-            let connector = connectorId;
-            if (!connector) {
-                const connectors = await this.orm.searchRead('payment.connector', [['is_active', '=', true]], ['id'], { limit: 1 });
-                if (connectors.length === 0) throw new Error(_t('No active payment connector found'));
-                connector = connectors[0].id;
-            }
-
-            const result = await this.orm.call('payment.connector','validate_payment',[connector, orderData]);
+            // Sans connecteur explicite, le serveur route selon le POS (pos_config_id)
+            const ids = connectorId ? [connectorId] : [];
+            const result = await this.orm.call('payment.connector','validate_payment',[ids, orderData]);
             return result;
         } catch (error) {
             return { success: false, error: error.message || _t('Validation failed'), error_type: 'client_error' };
@@ -1398,33 +1287,6 @@ initializeInterface() {
         if (!terminalId || isNaN(terminalId)) console.error('  - Terminal ID invalide');
         if (!requestId) console.error('  - Request ID manquant');
         if (!jwt) console.error('  - JWT Token manquant');
-    }
-
-    let jobId = null;
-    
-    if (canCreateJob) {
-        try {
-            console.log('🎯 ===== TENTATIVE CREATE PRINT JOB =====');
-            console.log('📤 Paramètres envoyés:');
-            console.log('  - transactionId:', transactionId);
-            console.log('  - terminalId:', terminalId);
-            console.log('  - requestId:', requestId);
-            
-            const job = await this.createPrintJobWithDiagnostic(transactionId, terminalId, requestId);
-            jobId = job?.jobId;
-            console.log('✅ PrintJob créé avec succès, jobId:', jobId);
-            
-        } catch (e) {
-            console.error('❌ ERREUR CREATE PRINT JOB:');
-            console.error('  - Type:', e.constructor.name);
-            console.error('  - Message:', e.message);
-            console.error('  - Stack:', e.stack);
-            
-            // On imprime quand même, mais on notifie que le journal serveur n'a pas été créé
-            this.notification.add('⚠️ Impression sans journal serveur: ' + e.message, { type: 'warning' });
-        }
-    } else {
-        console.warn('⚠️ CREATE PRINT JOB IGNORÉ - Conditions non remplies');
         this.notification.add('⚠️ PrintJob ignoré - Données manquantes', { type: 'warning' });
     }
 
@@ -1444,29 +1306,16 @@ initializeInterface() {
     console.log('✅ Résultat:', result);
     console.log('⏱️ Durée:', duration, 'ms');
 
-    // 8) ✅ DIAGNOSTIC FINALISATION
-    if (jobId) {
-        console.log('🔍 ===== FINALISATION PRINT JOB =====');
-        console.log('🔄 JobId à finaliser:', jobId);
-        console.log('📊 Status impression:', result.ok ? 'SUCCESS' : 'FAILED');
-        console.log('📝 Reason:', result.reason);
-        
-        try {
-            if (result.ok) {
-                console.log('📡 Envoi PATCH SUCCESS...');
-                await this.finalizePrintJobWithDiagnostic(jobId, 'SUCCESS', result.reason || null, duration);
-            } else {
-                console.log('📡 Envoi PATCH FAILED...');
-                await this.finalizePrintJobWithDiagnostic(jobId, 'FAILED', result.reason || null, duration);
-                }
-            console.log('✅ Finalisation terminée avec succès');
-        } catch (e) {
-            console.error('❌ ERREUR FINALISATION:');
-            console.error('  - Message:', e.message);
-            console.error('  - Stack:', e.stack);
-        }
-    } else {
-        console.warn('⚠️ FINALISATION IGNORÉE - Pas de jobId');
+    // 8) ✅ RELAIS PRINT JOB : un seul envoi à Odoo, transmis à Spring Boot en arrière-plan
+    if (canCreateJob) {
+        this.relayPrintJob({
+            transactionId,
+            terminalId,
+            requestId,
+            status: result.ok ? 'SUCCESS' : 'FAILED',
+            errorMessage: result.reason || null,
+            durationMs: duration,
+        }, jwt);
     }
 
     // 9) Reste de votre logique existante (conservée)
@@ -1534,7 +1383,7 @@ initializeInterface() {
     const impressionStatus = result.ok ? 'envoyé à l\'imprimante' : 'échec impression';
     this.dialog.add(AlertDialog, {
         title: _t('✅ Paiement Validé avec Succès (Diagnostic)'),
-        body: message + `\n\n🖨️ Ticket ${impressionStatus}\n\n🔍 Diagnostic:\n• JobID: ${jobId || 'NULL'}\n• TransactionID: ${transactionId || 'NULL'}\n• TerminalID: ${terminalId || 'NULL'}`,
+        body: message + `\n\n🖨️ Ticket ${impressionStatus}\n\n🔍 Diagnostic:\n• PrintJob: ${canCreateJob ? 'relayé' : 'ignoré'}\n• TransactionID: ${transactionId || 'NULL'}\n• TerminalID: ${terminalId || 'NULL'}`,
         confirmLabel: _t('OK')
     });
 
@@ -1545,14 +1394,13 @@ initializeInterface() {
     );
 
     // Notification impression avec diagnostic
-    this.notification.add('Ticket ' + impressionStatus + ` (JobID: ${jobId || 'NULL'})`, { type: result.ok ? 'success' : 'warning' });
+    this.notification.add('Ticket ' + impressionStatus + ` (PrintJob: ${canCreateJob ? 'relayé' : 'ignoré'})`, { type: result.ok ? 'success' : 'warning' });
     
     console.log('🏁 ===== FIN DIAGNOSTIC PRINT JOB =====');
     console.log('📊 RÉSUMÉ:');
     console.log('  - TransactionID trouvé:', transactionId);
-    console.log('  - JobID créé:', jobId);
+    console.log('  - PrintJob relayé:', canCreateJob ? 'OUI' : 'NON');
     console.log('  - Impression réussie:', result.ok);
-    console.log('  - Finalisation OK:', jobId ? 'OUI' : 'NON');
 }
 
     // ✅ MODIFICATION : generateTicketContent avec support 58/80mm